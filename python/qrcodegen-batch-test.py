@@ -24,8 +24,8 @@
 #   Software.
 # 
 
-import itertools, random, subprocess, sys, time
-from typing import List, Optional, TypeVar
+import concurrent.futures, itertools, os, random, subprocess, sys, time
+from typing import Callable, List, Optional, Sequence, TypeVar
 
 
 CHILD_PROGRAMS: List[List[str]] = [
@@ -37,26 +37,37 @@ CHILD_PROGRAMS: List[List[str]] = [
 	["../rust/target/debug/examples/qrcodegen-worker"],  # Rust program
 ]
 
+# Translation table that maps each byte value to the ASCII range
+ASCII_MASK: bytes = bytes(i & 0x7F for i in range(256))
+
+# Pre-encoded input lines for the values -1 to 255, which cover every data byte and parameter
+ENCODED_LINES: List[bytes] = [b"%d\n" % i for i in range(-1, 256)]
+
 
 subprocs: List[subprocess.Popen] = []
+readbuffers: List[bytes] = []  # Output already read from each worker but not yet consumed
+readpool = concurrent.futures.ThreadPoolExecutor(len(CHILD_PROGRAMS))
 
 def main() -> None:
 	# Launch workers
 	global subprocs
 	try:
 		for args in CHILD_PROGRAMS:
-			subprocs.append(subprocess.Popen(args, universal_newlines=True,
+			subprocs.append(subprocess.Popen(args,
 				stdin=subprocess.PIPE, stdout=subprocess.PIPE))
+			readbuffers.append(b"")
 	except FileNotFoundError:
 		write_all(-1)
 		raise
 	
-	# Check if any died
-	time.sleep(0.3)
+	# Check if any died, giving up early as soon as one does
+	deadline = time.monotonic() + 0.3
+	while time.monotonic() < deadline and all(proc.poll() is None for proc in subprocs):
+		time.sleep(0.01)
 	if any(proc.poll() is not None for proc in subprocs):
 		for proc in subprocs:
 			if proc.poll() is None:
-				print(-1, file=proc.stdin)
+				not_none(proc.stdin).write(b"-1\n")
 				not_none(proc.stdin).flush()
 		sys.exit("Error: One or more workers failed to start")
 	
@@ -68,25 +79,9 @@ def main() -> None:
 
 
 def do_trial() -> None:
-	mode = random.randrange(4)
-	if mode == 0:  # Numeric
-		length = round((2 * 7089) ** random.random())
-		data = random.choices(b"0123456789", k=length)
-	elif mode == 1:  # Alphanumeric
-		length = round((2 * 4296) ** random.random())
-		data = random.choices(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:", k=length)
-	elif mode == 2:  # ASCII
-		length = round((2 * 2953) ** random.random())
-		data = [random.randrange(128) for _ in range(length)]
-	elif mode == 3:  # Byte
-		length = round((2 * 2953) ** random.random())
-		data = [random.randrange(256) for _ in range(length)]
-	else:
-		raise AssertionError()
-	
-	write_all(length)
-	for b in data:
-		write_all(b)
+	mode = random.randrange(len(DATA_GENERATORS))
+	data = DATA_GENERATORS[mode]()
+	length = len(data)
 	
 	errcorlvl = random.randrange(4)
 	minversion = random.randint(1, 40)
@@ -99,36 +94,84 @@ def do_trial() -> None:
 	boostecl = int(random.random() < 0.2)
 	print("mode={} len={} ecl={} minv={} maxv={} mask={} boost={}".format(mode, length, errcorlvl, minversion, maxversion, mask, boostecl), end="")
 	
-	write_all(errcorlvl)
-	write_all(minversion)
-	write_all(maxversion)
-	write_all(mask)
-	write_all(boostecl)
-	flush_all()
+	write_all_many([length, *data, errcorlvl, minversion, maxversion, mask, boostecl])
 	
 	version = read_verify()
 	print(" version={}".format(version), end="")
 	if version == -1:
 		return
 	size = version * 4 + 17
-	for _ in range(size**2):
-		read_verify()
+	read_verify_lines(size**2)
+
+
+def make_numeric_data() -> bytes:
+	length = round((2 * 7089) ** random.random())
+	return bytes(random.choices(b"0123456789", k=length))
+
+def make_alphanumeric_data() -> bytes:
+	length = round((2 * 4296) ** random.random())
+	return bytes(random.choices(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:", k=length))
+
+def make_ascii_data() -> bytes:
+	length = round((2 * 2953) ** random.random())
+	return random.randbytes(length).translate(ASCII_MASK)
+
+def make_byte_data() -> bytes:
+	length = round((2 * 2953) ** random.random())
+	return random.randbytes(length)
+
+# Indexed by the trial's mode number
+DATA_GENERATORS: List[Callable[[], bytes]] = [
+	make_numeric_data,
+	make_alphanumeric_data,
+	make_ascii_data,
+	make_byte_data,
+]
 
 
 def write_all(val: int) -> None:
+	line = encode_line(val)
 	for proc in subprocs:
-		print(val, file=proc.stdin)
+		not_none(proc.stdin).write(line)
 
-def flush_all() -> None:
+def write_all_many(vals: Sequence[int]) -> None:
+	# Each worker receives the whole buffer in one write and is flushed
+	# right away, so it can start working while the others are fed
+	buf = b"".join(map(encode_line, vals))
 	for proc in subprocs:
-		not_none(proc.stdin).flush()
+		f = not_none(proc.stdin)
+		f.write(buf)
+		f.flush()
+
+def encode_line(val: int) -> bytes:
+	if -1 <= val < len(ENCODED_LINES) - 1:
+		return ENCODED_LINES[val + 1]
+	return b"%d\n" % val
 
 def read_verify() -> int:
-	val = not_none(subprocs[0].stdout).readline().rstrip("\r\n")
-	for proc in subprocs[1 : ]:
-		if not_none(proc.stdout).readline().rstrip("\r\n") != val:
-			raise ValueError("Mismatch")
-	return int(val)
+	return int(read_verify_lines(1)[0])
+
+def read_verify_lines(count: int) -> List[bytes]:
+	# Each worker's output pipe is drained on its own thread, so the
+	# blocking reads overlap instead of waiting on one worker at a time
+	def read_lines(i: int) -> List[bytes]:
+		# Read large blocks until enough lines are buffered, then split them all at once
+		fd = not_none(subprocs[i].stdout).fileno()  # Only ever read raw, so nothing is left in the file object's buffer
+		buf = readbuffers[i]
+		numlines = buf.count(b"\n")
+		while numlines < count:
+			block = os.read(fd, 1 << 16)
+			if block == b"":
+				raise EOFError("Worker output ended unexpectedly")
+			buf += block
+			numlines += block.count(b"\n")
+		*lines, readbuffers[i] = buf.replace(b"\r\n", b"\n").split(b"\n", count)
+		return lines
+	
+	vals, *others = readpool.map(read_lines, range(len(subprocs)))
+	if any(lines != vals for lines in others):
+		raise ValueError("Mismatch")
+	return vals
 
 
 T = TypeVar("T")
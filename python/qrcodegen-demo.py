@@ -24,6 +24,7 @@
 #   Software.
 # 
 
+import sys
 from qrcodegen import QrCode, QrSegment
 
 
@@ -110,42 +111,46 @@ def do_segment_demo() -> None:
 	qr = QrCode.encode_text(madoka, QrCode.Ecc.LOW)
 	print_qr(qr)
 	
-	kanjicharbits = [  # Kanji mode encoding (13 bits per character)
-		0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 1, 0, 1,
-		1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0,
-		0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0,
-		0, 1, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1,
-		0, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 1, 1,
-		0, 0, 0, 0, 1, 0, 1, 0, 1, 1, 1, 0, 0,
-		0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 1, 1,
-		0, 0, 0, 0, 1, 0, 0, 1, 0, 1, 0, 0, 1,
-		0, 0, 0, 0, 0, 0, 1, 0, 1, 1, 0, 0, 1,
-		0, 0, 0, 0, 1, 1, 0, 1, 1, 1, 1, 0, 1,
-		0, 0, 0, 0, 1, 1, 0, 0, 0, 1, 1, 0, 1,
-		0, 0, 0, 0, 1, 1, 0, 0, 0, 1, 0, 1, 0,
-		0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 1, 1, 0,
-		0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 1,
-		0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0,
-		0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1,
-		0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
-		0, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 1,
-		0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 0,
-		0, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 1,
-		0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
-		0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 0, 0,
-		0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 0, 1,
-		0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1,
-		0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 1,
-		0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
-		0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 0, 0, 0,
-		0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1,
-		0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0,
-	]
-	segs = [QrSegment(QrSegment.Mode.KANJI, len(kanjicharbits) // 13, kanjicharbits)]
+	kanjicharbits = [(c >> i) & 1 for c in KANJI_CHARS for i in reversed(range(13))]  # Unpack to a list of bits
+	segs = [QrSegment(QrSegment.Mode.KANJI, len(KANJI_CHARS), kanjicharbits)]
 	qr = QrCode.encode_segments(segs, QrCode.Ecc.LOW)
 	print_qr(qr)
 
 
+# The "Madoka" text from do_segment_demo() in kanji mode encoding, one 13-bit value per character
+KANJI_CHARS = (
+	0b0000000110101,
+	0b1000000000010,
+	0b0111111000000,
+	0b0101011101101,
+	0b0101011010111,
+	0b0000101011100,
+	0b0000101000111,
+	0b0000100101001,
+	0b0000001011001,
+	0b0000110111101,
+	0b0000110001101,
+	0b0000110001010,
+	0b0000000110110,
+	0b0000101000001,
+	0b0000101000100,
+	0b0000000000001,
+	0b0000000000000,
+	0b0001001001001,
+	0b0001001000000,
+	0b0001001001001,
+	0b0000000000000,
+	0b0000100000100,
+	0b0000100000101,
+	0b0000100010011,
+	0b0000100010101,
+	0b0000000000000,
+	0b0001000001000,
+	0b0000111111111,
+	0b0000000001000,
+)
+
+
 def do_mask_demo() -> None:
 	"""Creates QR Codes with the same size and contents but different mask patterns."""
 	
@@ -173,11 +178,22 @@ def do_mask_demo() -> None:
 def print_qr(qrcode: QrCode) -> None:
 	"""Prints the given QrCode object to the console."""
 	border = 4
-	for y in range(-border, qrcode.get_size() + border):
-		for x in range(-border, qrcode.get_size() + border):
-			print("\u2588 "[1 if qrcode.get_module(x,y) else 0] * 2, end="")
-		print()
-	print()
+	size = qrcode.get_size()
+	cells = CELLS
+	edge = cells[False] * border  # Left and right border of each row
+	blankrow = cells[False] * (size + border * 2) + "\n"
+	out = [blankrow] * border
+	for row in qrcode.get_modules():
+		out.append(edge)
+		out.extend([cells[color] for color in row])
+		out.append(edge + "\n")
+	out.extend([blankrow] * border)
+	out.append("\n")
+	sys.stdout.write("".join(out))
+
+
+# The text drawn for a white (index False) and black (index True) module
+CELLS = ("\u2588\u2588", "  ")
 
 
 # Run the main program
@@ -26,46 +26,64 @@
 #   Software.
 # 
 
-import sys
+import itertools, os, sys
+from typing import Iterator
 import qrcodegen
 
 
-def read_int() -> int:
-	return int(input())
+def read_ints() -> Iterator[int]:
+	"""Yields each integer from standard input. The input is read in large blocks, but each block
+	is requested only after the previous one is used up, so this still works interactively."""
+	fd = sys.stdin.fileno()  # Read the raw file descriptor, which returns whatever is available up to the limit
+	partial = b""  # Incomplete last line of the previous block
+	while True:
+		block = os.read(fd, 1 << 16)
+		if block == b"":
+			break
+		lines = (partial + block).split(b"\n")
+		partial = lines.pop()
+		for line in lines:
+			yield int(line)
+	if partial.strip() != b"":
+		yield int(partial)
+	raise EOFError()
 
 
 def main() -> None:
+	make_segments = qrcodegen.QrSegment.make_segments
+	make_bytes = qrcodegen.QrSegment.make_bytes
+	encode_segments = qrcodegen.QrCode.encode_segments
+	write = sys.stdout.write
+	ints = read_ints()
 	while True:
 		
 		# Read data or exit
-		length = read_int()
+		length = next(ints)
 		if length == -1:
 			break
-		data = bytearray(read_int() for _ in range(length))
+		data = bytearray(itertools.islice(ints, length))
 		
 		# Read encoding parameters
-		errcorlvl  = read_int()
-		minversion = read_int()
-		maxversion = read_int()
-		mask       = read_int()
-		boostecl   = read_int()
+		errcorlvl  = next(ints)
+		minversion = next(ints)
+		maxversion = next(ints)
+		mask       = next(ints)
+		boostecl   = next(ints)
 		
 		# Make segments for encoding
-		if all((b < 128) for b in data):  # Is ASCII
-			segs = qrcodegen.QrSegment.make_segments(data.decode("ASCII"))
-		else:
-			segs = [qrcodegen.QrSegment.make_bytes(data)]
+		try:  # Is ASCII
+			segs = make_segments(data.decode("ASCII"))
+		except UnicodeDecodeError:
+			segs = [make_bytes(data)]
 		
 		try:  # Try to make QR Code symbol
-			qr = qrcodegen.QrCode.encode_segments(segs, ECC_LEVELS[errcorlvl], minversion, maxversion, mask, boostecl != 0)
-			# Print grid of modules
-			print(qr.get_version())
-			for y in range(qr.get_size()):
-				for x in range(qr.get_size()):
-					print(1 if qr.get_module(x, y) else 0)
+			qr = encode_segments(segs, ECC_LEVELS[errcorlvl], minversion, maxversion, mask, boostecl != 0)
+			# Print version and grid of modules
+			write("{}\n".format(qr.get_version()))
+			write("".join([("1\n" if color else "0\n") for row in qr.get_modules() for color in row]))
 			
 		except qrcodegen.DataTooLongError:
-			print(-1)
+			write("-1\n")
 		sys.stdout.flush()
 
 
@@ -22,8 +22,8 @@
 # 
 
 from __future__ import annotations
-import collections, itertools, re
-from typing import List, Optional, Tuple
+import functools, itertools, operator, re
+from typing import List, Optional, Sequence, Tuple, Union
 
 
 """
@@ -40,6 +40,7 @@ This module "qrcodegen", public members:
   - Method get_error_correction_level() -> QrCode.Ecc
   - Method get_mask() -> int
   - Method get_module(int x, int y) -> bool
+  - Method get_modules() -> list<list<bool>>
   - Method to_svg_str(int border) -> str
   - Enum Ecc:
     - Constants LOW, MEDIUM, QUARTILE, HIGH
@@ -119,10 +120,15 @@ class QrCode:
 		if not (QrCode.MIN_VERSION <= minversion <= maxversion <= QrCode.MAX_VERSION) or not (-1 <= mask <= 7):
 			raise ValueError("Invalid value")
 		
-		# Find the minimal version number to use
+		# Find the minimal version number to use. The widths of character count fields only
+		# change between version ranges, so the total bits of the segments only need to be
+		# recomputed when a new range is entered, rather than once for every version that is tried
+		countrange: Optional[int] = None
 		for version in range(minversion, maxversion + 1):
 			datacapacitybits = QrCode._get_num_data_codewords(version, ecl) * 8  # Number of data bits available
-			datausedbits = QrSegment.get_total_bits(segs, version)
+			if QrSegment.Mode.char_count_range(version) != countrange:
+				countrange = QrSegment.Mode.char_count_range(version)
+				datausedbits = QrSegment.get_total_bits(segs, version)
 			if datausedbits is not None and datausedbits <= datacapacitybits:
 				break  # This version number is found to be suitable
 			if version >= maxversion:  # All versions in the range could not fit the given data
@@ -143,26 +149,27 @@ class QrCode:
 		for seg in segs:
 			bb.append_bits(seg.get_mode().get_mode_bits(), 4)
 			bb.append_bits(seg.get_num_chars(), seg.get_mode().num_char_count_bits(version))
-			bb.extend(seg._bitdata)
+			bb.append_buffer(seg._bitdata)
 		assert len(bb) == datausedbits
 		
-		# Add terminator and pad up to a byte if applicable
+		# Add terminator and pad up to a byte if applicable. The bit count is tracked
+		# in a local variable instead of asking the buffer for its length every time.
+		numbits = datausedbits
 		datacapacitybits = QrCode._get_num_data_codewords(version, ecl) * 8
-		assert len(bb) <= datacapacitybits
-		bb.append_bits(0, min(4, datacapacitybits - len(bb)))
-		bb.append_bits(0, -len(bb) % 8)  # Note: Python's modulo on negative numbers behaves better than C family languages
-		assert len(bb) % 8 == 0
+		assert numbits <= datacapacitybits
+		terminatorbits = min(4, datacapacitybits - numbits)
+		numbits += terminatorbits
+		alignbits = -numbits % 8  # Note: Python's modulo on negative numbers behaves better than C family languages
+		numbits += alignbits
+		bb.append_bits(0, terminatorbits + alignbits)
+		assert len(bb) == numbits and numbits % 8 == 0
 		
 		# Pad with alternating bytes until data capacity is reached
-		for padbyte in itertools.cycle((0xEC, 0x11)):
-			if len(bb) >= datacapacitybits:
-				break
-			bb.append_bits(padbyte, 8)
+		numpad = (datacapacitybits - numbits) // 8
+		bb.append_bytes((b"\xEC\x11" * ((numpad + 1) // 2))[ : numpad])
 		
-		# Pack bits into bytes in big endian
-		datacodewords = [0] * (len(bb) // 8)
-		for (i, bit) in enumerate(bb):
-			datacodewords[i >> 3] |= bit << (7 - (i & 7))
+		# Pack bits into bytes in big endian, all at once
+		datacodewords = bb.get_bytes()
 		
 		# Create the QR Code object
 		return QrCode(version, ecl, datacodewords, mask)
@@ -186,17 +193,15 @@ class QrCode:
 	# the resulting object still has a mask value between 0 and 7.
 	_mask: int
 	
-	# The modules of this QR Code (False = white, True = black).
+	# The modules of this QR Code (0 = white, 1 = black), stored in row-major
+	# order so that the module at (x, y) is at index y * size + x.
 	# Immutable after constructor finishes. Accessed through get_module().
-	_modules: List[List[bool]]
-	
-	# Indicates function modules that are not subjected to masking. Discarded when constructor finishes.
-	_isfunction: List[List[bool]]
+	_modules: bytearray
 	
 	
 	# ---- Constructor (low level) ----
 	
-	def __init__(self, version: int, errcorlvl: QrCode.Ecc, datacodewords: List[int], mask: int) -> None:
+	def __init__(self, version: int, errcorlvl: QrCode.Ecc, datacodewords: Sequence[int], mask: int) -> None:
 		"""Creates a new QR Code with the given version number,
 		error correction level, data codeword bytes, and mask number.
 		This is a low-level API that most users should not use directly.
@@ -214,9 +219,8 @@ class QrCode:
 		self._size = version * 4 + 17
 		self._errcorlvl = errcorlvl
 		
-		# Initialize both grids to be size*size arrays of Boolean false
-		self._modules    = [[False] * self._size for _ in range(self._size)]  # Initially all white
-		self._isfunction = [[False] * self._size for _ in range(self._size)]
+		# Initialize the grid to be a flat size*size array of zeros
+		self._modules = bytearray(self._size**2)  # Initially all white
 		
 		# Compute ECC, draw modules
 		self._draw_function_patterns()
@@ -229,7 +233,7 @@ class QrCode:
 			for i in range(8):
 				self._apply_mask(i)
 				self._draw_format_bits(i)
-				penalty = self._get_penalty_score()
+				penalty = self._get_penalty_score(minpenalty)
 				if penalty < minpenalty:
 					mask = i
 					minpenalty = penalty
@@ -238,8 +242,6 @@ class QrCode:
 		self._apply_mask(mask)  # Apply the final choice of mask
 		self._draw_format_bits(mask)  # Overwrite old format bits
 		self._mask = mask
-		
-		del self._isfunction
 	
 	
 	# ---- Accessor methods ----
@@ -264,7 +266,14 @@ class QrCode:
 		"""Returns the color of the module (pixel) at the given coordinates, which is False
 		for white or True for black. The top left corner has the coordinates (x=0, y=0).
 		If the given coordinates are out of bounds, then False (white) is returned."""
-		return (0 <= x < self._size) and (0 <= y < self._size) and self._modules[y][x]
+		return (0 <= x < self._size) and (0 <= y < self._size) and self._modules[y * self._size + x] != 0
+	
+	def get_modules(self) -> List[List[bool]]:
+		"""Returns a new copy of all the modules of this QR Code, as a list of size rows that each
+		contain size colors (False for white, True for black). The module at (x, y) is result[y][x].
+		This is faster than calling get_module() on every coordinate."""
+		size = self._size
+		return [[(cell != 0) for cell in self._modules[i : i + size]] for i in range(0, size**2, size)]
 	
 	
 	# ---- Public instance methods ----
@@ -274,11 +283,10 @@ class QrCode:
 		of border modules. The string always uses Unix newlines (\n), regardless of the platform."""
 		if border < 0:
 			raise ValueError("Border must be non-negative")
-		parts = []
-		for y in range(self._size):
-			for x in range(self._size):
-				if self.get_module(x, y):
-					parts.append("M{},{}h1v1h-1z".format(x + border, y + border))
+		size = self._size
+		# Visit only the dark modules, found by their indices in the flattened grid
+		parts = ["M{},{}h1v1h-1z".format(i % size + border, i // size + border)
+			for i in itertools.compress(range(size**2), self._modules)]
 		return """<?xml version="1.0" encoding="UTF-8"?>
 <!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
 <svg xmlns="http://www.w3.org/2000/svg" version="1.1" viewBox="0 0 {0} {0}" stroke="none">
@@ -291,7 +299,8 @@ class QrCode:
 	# ---- Private helper methods for constructor: Drawing function modules ----
 	
 	def _draw_function_patterns(self) -> None:
-		"""Reads this object's version field, and draws and marks all function modules."""
+		"""Reads this object's version field, and draws all function modules. Which modules
+		these are is given separately by _get_function_modules(), for the same version."""
 		# Draw horizontal and vertical timing patterns
 		for i in range(self._size):
 			self._set_function_module(6, i, i % 2 == 0)
@@ -303,7 +312,7 @@ class QrCode:
 		self._draw_finder_pattern(3, self._size - 4)
 		
 		# Draw numerous alignment patterns
-		alignpatpos = self._get_alignment_pattern_positions()
+		alignpatpos = QrCode._get_alignment_pattern_positions(self._version)
 		numalign = len(alignpatpos)
 		skips = ((0, 0), (0, numalign - 1), (numalign - 1, 0))
 		for i in range(numalign):
@@ -319,29 +328,10 @@ class QrCode:
 	def _draw_format_bits(self, mask) -> None:
 		"""Draws two copies of the format bits (with its own error correction code)
 		based on the given mask and this object's error correction level field."""
-		# Calculate error correction code and pack bits
-		data = self._errcorlvl.formatbits << 3 | mask  # errCorrLvl is uint2, mask is uint3
-		rem = data
-		for _ in range(10):
-			rem = (rem << 1) ^ ((rem >> 9) * 0x537)
-		bits = (data << 10 | rem) ^ 0x5412  # uint15
-		assert bits >> 15 == 0
-		
-		# Draw first copy
-		for i in range(0, 6):
-			self._set_function_module(8, i, _get_bit(bits, i))
-		self._set_function_module(8, 7, _get_bit(bits, 6))
-		self._set_function_module(8, 8, _get_bit(bits, 7))
-		self._set_function_module(7, 8, _get_bit(bits, 8))
-		for i in range(9, 15):
-			self._set_function_module(14 - i, 8, _get_bit(bits, i))
-		
-		# Draw second copy
-		for i in range(0, 8):
-			self._set_function_module(self._size - 1 - i, 8, _get_bit(bits, i))
-		for i in range(8, 15):
-			self._set_function_module(8, self._size - 15 + i, _get_bit(bits, i))
-		self._set_function_module(8, self._size - 8, True)  # Always black
+		modules = self._modules
+		indices = QrCode._get_format_bit_indices(self._size)
+		for (i, bit) in zip(indices, QrCode._get_format_bit_values(self._errcorlvl, mask)):
+			modules[i] = bit
 	
 	
 	def _draw_version(self) -> None:
@@ -349,57 +339,49 @@ class QrCode:
 		based on this object's version field, iff 7 <= version <= 40."""
 		if self._version < 7:
 			return
-		
-		# Calculate error correction code and pack bits
-		rem = self._version  # version is uint6, in the range [7, 40]
-		for _ in range(12):
-			rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
-		bits = self._version << 12 | rem  # uint18
-		assert bits >> 18 == 0
-		
-		# Draw two copies
-		for i in range(18):
-			bit = _get_bit(bits, i)
-			a = self._size - 11 + i % 3
-			b = i // 3
-			self._set_function_module(a, b, bit)
-			self._set_function_module(b, a, bit)
+		modules = self._modules
+		for (i, bit) in zip(*QrCode._get_version_bit_layout(self._version)):
+			modules[i] = bit
 	
 	
 	def _draw_finder_pattern(self, x, y) -> None:
 		"""Draws a 9*9 finder pattern including the border separator,
 		with the center module at (x, y). Modules can be out of bounds."""
+		# Each row of the pattern is clipped to the grid and written as one slice
+		size = self._size
+		left, right = max(x - 4, 0), min(x + 5, size)
 		for dy in range(-4, 5):
-			for dx in range(-4, 5):
-				xx, yy = x + dx, y + dy
-				if (0 <= xx < self._size) and (0 <= yy < self._size):
-					# Chebyshev/infinity norm
-					self._set_function_module(xx, yy, max(abs(dx), abs(dy)) not in (2, 4))
+			yy = y + dy
+			if 0 <= yy < size:
+				i = yy * size
+				# Chebyshev/infinity norm
+				self._modules[i + left : i + right] = bytes(
+					(max(abs(dx), abs(dy)) not in (2, 4)) for dx in range(left - x, right - x))
 	
 	
 	def _draw_alignment_pattern(self, x, y) -> None:
 		"""Draws a 5*5 alignment pattern, with the center module
 		at (x, y). All modules must be in bounds."""
+		# Each row of the pattern is written as one slice
 		for dy in range(-2, 3):
-			for dx in range(-2, 3):
-				self._set_function_module(x + dx, y + dy, max(abs(dx), abs(dy)) != 1)
+			i = (y + dy) * self._size + x
+			self._modules[i - 2 : i + 3] = bytes((max(abs(dx), abs(dy)) != 1) for dx in range(-2, 3))
 	
 	
 	def _set_function_module(self, x: int, y: int, isblack: bool) -> None:
-		"""Sets the color of a module and marks it as a function module.
+		"""Sets the color of a function module.
 		Only used by the constructor. Coordinates must be in bounds."""
-		assert type(isblack) is bool
-		self._modules[y][x] = isblack
-		self._isfunction[y][x] = True
+		self._modules[y * self._size + x] = isblack
 	
 	
 	# ---- Private helper methods for constructor: Codewords and masking ----
 	
-	def _add_ecc_and_interleave(self, data: List[int]) -> List[int]:
+	def _add_ecc_and_interleave(self, data: Sequence[int]) -> bytes:
 		"""Returns a new byte string representing the given data with the appropriate error correction
 		codewords appended to it, based on this object's version and error correction level."""
+		databytes = bytes(data)  # Also checks that every value is in the range [0, 255]
 		version = self._version
-		assert len(data) == QrCode._get_num_data_codewords(version, self._errcorlvl)
+		assert len(databytes) == QrCode._get_num_data_codewords(version, self._errcorlvl)
 		
 		# Calculate parameter numbers
 		numblocks = QrCode._NUM_ERROR_CORRECTION_BLOCKS[self._errcorlvl.ordinal][version]
@@ -413,141 +395,287 @@ class QrCode:
 		rsdiv = QrCode._reed_solomon_compute_divisor(blockecclen)
 		k = 0
 		for i in range(numblocks):
-			dat = data[k : k + shortblocklen - blockecclen + (0 if i < numshortblocks else 1)]
+			dat = databytes[k : k + shortblocklen - blockecclen + (0 if i < numshortblocks else 1)]
 			k += len(dat)
 			ecc = QrCode._reed_solomon_compute_remainder(dat, rsdiv)
 			if i < numshortblocks:
-				dat.append(0)
+				dat += b"\x00"
 			blocks.append(dat + ecc)
-		assert k == len(data)
-		
-		# Interleave (not concatenate) the bytes from every block into a single sequence
-		result = []
-		for i in range(len(blocks[0])):
-			for (j, blk) in enumerate(blocks):
-				# Skip the padding byte in short blocks
-				if i != shortblocklen - blockecclen or j >= numshortblocks:
-					result.append(blk[i])
+		assert k == len(databytes)
+		
+		# Interleave (not concatenate) the bytes from every block into a single sequence,
+		# by storing each block with a stride of numblocks bytes in one slice assignment
+		result = bytearray(len(blocks[0]) * numblocks)
+		for (j, blk) in enumerate(blocks):
+			result[j : : numblocks] = blk
+		# Remove the padding bytes of the short blocks, which all ended up next to each other
+		padstart = (shortblocklen - blockecclen) * numblocks
+		del result[padstart : padstart + numshortblocks]
 		assert len(result) == rawcodewords
-		return result
+		return bytes(result)
 	
 	
-	def _draw_codewords(self, data: List[int]) -> None:
+	def _draw_codewords(self, data: bytes) -> None:
 		"""Draws the given sequence of 8-bit codewords (data and error correction) onto the entire
-		data area of this QR Code. Function modules need to be marked off before this is called."""
+		data area of this QR Code. Function modules, as given by _get_function_modules(), are left unchanged."""
 		assert len(data) == QrCode._get_num_raw_data_modules(self._version) // 8
 		
+		# Unpack the codewords into one byte per bit, in big endian, and append them after a copy of the
+		# current grid, so that the placement can pick every module of the new grid out of this source
+		bits = "{:0{}b}".format(int.from_bytes(data, "big"), len(data) * 8)
+		source = self._modules + bits.encode("ASCII").translate(QrCode._DIGITS_TO_BITS)
+		placement = QrCode._get_codeword_placement(self._size)
+		self._modules[:] = bytes(placement(source))
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_codeword_placement(size: int) -> operator.itemgetter:
+		"""Returns a function that takes the current grid of modules (with the layout of _modules) followed by
+		one byte per codeword bit, and returns the new value of every module in the grid. Function modules
+		and remainder modules keep their current value. The zigzag scan depends only on the size."""
+		ver = (size - 17) // 4
+		isfunction = QrCode._get_function_modules(ver)
+		numbits = QrCode._get_num_raw_data_modules(ver) // 8 * 8
+		result = list(range(size**2))  # Default to keeping the current value
 		i = 0  # Bit index into the data
 		# Do the funny zigzag scan
-		for right in range(self._size - 1, 0, -2):  # Index of right column in each column pair
+		for right in range(size - 1, 0, -2):  # Index of right column in each column pair
 			if right <= 6:
 				right -= 1
-			for vert in range(self._size):  # Vertical counter
+			for vert in range(size):  # Vertical counter
 				for j in range(2):
 					x = right - j  # Actual x coordinate
 					upward = (right + 1) & 2 == 0
-					y = (self._size - 1 - vert) if upward else vert  # Actual y coordinate
-					if not self._isfunction[y][x] and i < len(data) * 8:
-						self._modules[y][x] = _get_bit(data[i >> 3], 7 - (i & 7))
+					y = (size - 1 - vert) if upward else vert  # Actual y coordinate
+					if not isfunction[y * size + x] and i < numbits:
+						result[y * size + x] = size**2 + i
 						i += 1
 					# If this QR Code has any remainder bits (0 to 7), they were assigned as
 					# 0/false/white by the constructor and are left unchanged by this method
-		assert i == len(data) * 8
+		assert i == numbits
+		return operator.itemgetter(*result)
 	
 	
 	def _apply_mask(self, mask: int) -> None:
 		"""XORs the codeword modules in this QR Code with the given mask pattern.
-		The function modules must be marked and the codeword bits must be drawn
-		before masking. Due to the arithmetic of XOR, calling _apply_mask() with
+		The codeword bits must be drawn before masking, and function modules are
+		left unchanged. Due to the arithmetic of XOR, calling _apply_mask() with
 		the same mask value a second time will undo the mask. A final well-formed
 		QR Code needs exactly one (not zero, two, etc.) mask applied."""
 		if not (0 <= mask <= 7):
 			raise ValueError("Mask value out of range")
-		masker = QrCode._MASK_PATTERNS[mask]
-		for y in range(self._size):
-			for x in range(self._size):
-				self._modules[y][x] ^= (masker(x, y) == 0) and (not self._isfunction[y][x])
+		# Each grid byte is 0 or 1, so reading a whole grid as one big integer lets
+		# the entire XOR be done at once, with Python's bitwise operators on integers
+		numbytes = self._size**2
+		flips = QrCode._get_mask_flips(self._size, mask)
+		result = int.from_bytes(self._modules, "big") ^ flips
+		self._modules[:] = result.to_bytes(numbytes, "big")
 	
 	
-	def _get_penalty_score(self) -> int:
+	def _get_penalty_score(self, cutoff: int = 1 << 32) -> int:
 		"""Calculates and returns the penalty score based on state of this QR Code's current modules.
-		This is used by the automatic mask choice algorithm to find the mask pattern that yields the lowest score."""
+		This is used by the automatic mask choice algorithm to find the mask pattern that yields the lowest score.
+		Every part of the score is non-negative, so as soon as the running total reaches the given cutoff,
+		the scoring stops early and returns some value that is at least the cutoff, but not the exact score."""
 		result = 0
 		size = self._size
 		modules = self._modules
 		
-		# Adjacent modules in row having same color, and finder-like patterns
-		for y in range(size):
-			runcolor = False
-			runx = 0
-			runhistory = collections.deque([0] * 7, 7)
-			for x in range(size):
-				if modules[y][x] == runcolor:
-					runx += 1
-					if runx == 5:
-						result += QrCode._PENALTY_N1
-					elif runx > 5:
-						result += 1
-				else:
-					self._finder_penalty_add_history(runx, runhistory)
-					if not runcolor:
-						result += self._finder_penalty_count_patterns(runhistory) * QrCode._PENALTY_N3
-					runcolor = modules[y][x]
-					runx = 1
-			result += self._finder_penalty_terminate_and_count(runcolor, runx, runhistory) * QrCode._PENALTY_N3
-		# Adjacent modules in column having same color, and finder-like patterns
-		for x in range(size):
-			runcolor = False
-			runy = 0
-			runhistory = collections.deque([0] * 7, 7)
-			for y in range(size):
-				if modules[y][x] == runcolor:
-					runy += 1
-					if runy == 5:
-						result += QrCode._PENALTY_N1
-					elif runy > 5:
-						result += 1
-				else:
-					self._finder_penalty_add_history(runy, runhistory)
-					if not runcolor:
-						result += self._finder_penalty_count_patterns(runhistory) * QrCode._PENALTY_N3
-					runcolor = modules[y][x]
-					runy = 1
-			result += self._finder_penalty_terminate_and_count(runcolor, runy, runhistory) * QrCode._PENALTY_N3
-		
-		# 2*2 blocks of modules having same color
-		for y in range(size - 1):
-			for x in range(size - 1):
-				if modules[y][x] == modules[y][x + 1] == modules[y + 1][x] == modules[y + 1][x + 1]:
-					result += QrCode._PENALTY_N2
-		
-		# Balance of black and white modules
-		black = sum((1 if cell else 0) for row in modules for cell in row)
+		# The two rules that examine the whole grid at once are cheap, so they are done first
+		# to give the cutoff below the best chance of skipping work on the line-by-line rules
+		
+		# 2*2 blocks of modules having same color. The whole grid is packed into one integer (bit
+		# size*size-1-i is the module at index i), so that shifting it by 1, size, or size+1 bits lines
+		# up every module with its right, lower, and lower right neighbors, and all blocks are compared at once
+		grid = int(modules.translate(QrCode._BITS_TO_DIGITS), 2)
+		differ = (grid ^ (grid << 1)) | (grid ^ (grid << size)) | (grid ^ (grid << (size + 1)))
+		same = ~differ & QrCode._get_block_corners(size)
+		result += bin(same).count("1") * QrCode._PENALTY_N2
+		
+		# Balance of black and white modules, counted over the whole grid at once
+		black = modules.count(1)
 		total = size**2  # Note that size is odd, so black/total != 1/2
 		# Compute the smallest integer k >= 0 such that (45-5k)% <= black/total <= (55+5k)%
 		k = (abs(black * 20 - total * 10) + total - 1) // total - 1
 		result += k * QrCode._PENALTY_N4
+		
+		# Bind everything used per line to local variables, which are the cheapest to access
+		findruns = QrCode._RUN_REGEX.findall
+		n1 = QrCode._PENALTY_N1
+		n3 = QrCode._PENALTY_N3
+		
+		# Adjacent modules in row or column having same color, and finder-like patterns.
+		# Each row and column is a bytearray slice of the grid, which a regular expression
+		# splits directly into runs of same-colored modules, and then only the runs are examined.
+		rows    = (modules[i : i + size] for i in range(0, size**2, size))
+		columns = (modules[x : : size] for x in range(size))
+		for line in itertools.chain(rows, columns):
+			if result >= cutoff:
+				return result  # This mask can no longer beat the best one so far
+			runs = [len(run) for run in findruns(line)]
+			if line[0]:
+				runs.insert(0, 0)  # Every line starts with a white run, which can be empty
+			result += sum((n1 + n - 5) for n in runs if n >= 5)
+			if len(runs) % 2 == 0:
+				runs.append(0)  # Every line also ends with a white run
+			runs[0] += size  # Add white border to initial run
+			runs[-1] += size  # Add white border to final run
+			# Every window of 7 runs from a white run to a white run is finder-like if its
+			# middle 5 runs have the widths n, n, 3n, n, n, and one outer run is at least
+			# 4n wide and the other is at least n wide. Each side can count once.
+			for (w0, b1, w2, b3, w4, b5, w6) in zip(runs[0 : : 2], runs[1 : : 2], runs[2 : : 2],
+					runs[3 : : 2], runs[4 : : 2], runs[5 : : 2], runs[6 : : 2]):
+				if b3 == b1 * 3 and b1 == w2 == w4 == b5:
+					result += ((w0 >= b1 * 4 and w6 >= b1) + (w6 >= b1 * 4 and w0 >= b1)) * n3
 		return result
 	
 	
 	# ---- Private helper functions ----
 	
-	def _get_alignment_pattern_positions(self) -> List[int]:
-		"""Returns an ascending list of positions of alignment patterns for this version number.
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_alignment_pattern_positions(ver: int) -> Tuple[int, ...]:
+		"""Returns an ascending tuple of positions of alignment patterns for the given version number.
 		Each position is in the range [0,177), and are used on both the x and y axes.
 		This could be implemented as lookup table of 40 variable-length lists of integers."""
-		ver = self._version
 		if ver == 1:
-			return []
+			return ()
 		else:
 			numalign = ver // 7 + 2
 			step = 26 if (ver == 32) else \
 				(ver*4 + numalign*2 + 1) // (numalign*2 - 2) * 2
-			result = [(self._size - 7 - i * step) for i in range(numalign - 1)] + [6]
-			return list(reversed(result))
+			size = ver * 4 + 17
+			result = [(size - 7 - i * step) for i in range(numalign - 1)] + [6]
+			return tuple(reversed(result))
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_block_corners(size: int) -> int:
+		"""Returns the modules of a QR Code of the given size that are the top left corner of a 2*2 block,
+		packed into an integer like the grid in _get_penalty_score()."""
+		corners = bytes((x < size - 1 and y < size - 1) for y in range(size) for x in range(size))
+		return int(corners.translate(QrCode._BITS_TO_DIGITS), 2)
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_function_modules(ver: int) -> bytes:
+		"""Returns the grid of function modules of a QR Code of the given version number, as a flat
+		size*size array in the same layout as _modules, where 1 means the module is a function module.
+		These are the modules that _draw_function_patterns() draws, which codewords and masking skip."""
+		size = ver * 4 + 17
+		result = bytearray(size**2)
+		
+		# Timing patterns: row 6 and column 6
+		result[6 * size : 7 * size] = b"\x01" * size
+		result[6 : : size] = b"\x01" * size
+		
+		# Finder patterns with their separators: the 8*8 square that is in bounds at three corners
+		for y in range(8):
+			top = y * size
+			bottom = (size - 8 + y) * size
+			result[top : top + 8] = b"\x01" * 8  # Top left
+			result[top + size - 8 : top + size] = b"\x01" * 8  # Top right
+			result[bottom : bottom + 8] = b"\x01" * 8  # Bottom left
+		
+		# Alignment patterns: a 5*5 square around each center, except on the three finder corners
+		alignpatpos = QrCode._get_alignment_pattern_positions(ver)
+		numalign = len(alignpatpos)
+		skips = ((0, 0), (0, numalign - 1), (numalign - 1, 0))
+		for i in range(numalign):
+			for j in range(numalign):
+				if (i, j) not in skips:
+					x, y = alignpatpos[i], alignpatpos[j]
+					for yy in range(y - 2, y + 3):
+						result[yy * size + x - 2 : yy * size + x + 3] = b"\x01" * 5
+		
+		# Format and version information
+		for i in QrCode._get_format_bit_indices(size):
+			result[i] = 1
+		if ver >= 7:
+			for i in QrCode._get_version_bit_layout(ver)[0]:
+				result[i] = 1
+		return bytes(result)
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_mask_flips(size: int, mask: int) -> int:
+		"""Returns the modules that the given mask pattern flips in a QR Code of the given size, as an integer
+		whose big-endian bytes are laid out like the _modules grid, where 1 means the module is flipped.
+		Function modules are never flipped."""
+		# Every mask pattern repeats itself every 12 modules both horizontally and vertically, so only
+		# a 12*12 tile is evaluated, and then each row of the grid is copied from a row of the tile
+		masker = QrCode._MASK_PATTERNS[mask]
+		reps = size // 12 + 1
+		tilerows = [(bytes((masker(x, y) == 0) for x in range(12)) * reps)[ : size] for y in range(12)]
+		pattern = b"".join(tilerows[y % 12] for y in range(size))
+		isfunction = QrCode._get_function_modules((size - 17) // 4)
+		return int.from_bytes(pattern, "big") & ~int.from_bytes(isfunction, "big")
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_format_bit_indices(size: int) -> Tuple[int, ...]:
+		"""Returns the indices into the _modules grid of a QR Code of the given size where _draw_format_bits()
+		draws, in the same order as the values from _get_format_bit_values()."""
+		result: List[int] = []
+		# First copy
+		result.extend((i * size + 8) for i in range(0, 6))
+		result.extend((7 * size + 8, 8 * size + 8, 8 * size + 7))
+		result.extend((8 * size + 14 - i) for i in range(9, 15))
+		# Second copy
+		result.extend((8 * size + size - 1 - i) for i in range(0, 8))
+		result.extend(((size - 15 + i) * size + 8) for i in range(8, 15))
+		result.append((size - 8) * size + 8)  # Always black
+		return tuple(result)
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_format_bit_values(ecl: QrCode.Ecc, mask: int) -> bytes:
+		"""Returns the module values (0 or 1) that _draw_format_bits() draws for the given error correction
+		level and mask, in the same order as the indices from _get_format_bit_indices()."""
+		# Calculate error correction code and pack bits
+		data = ecl.formatbits << 3 | mask  # errCorrLvl is uint2, mask is uint3
+		rem = data
+		for _ in range(10):
+			rem = (rem << 1) ^ ((rem >> 9) * 0x537)
+		bits = (data << 10 | rem) ^ 0x5412  # uint15
+		assert bits >> 15 == 0
+		copy = [((bits >> i) & 1) for i in range(15)]
+		return bytes(copy + copy + [1])
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _get_version_bit_layout(ver: int) -> Tuple[Tuple[int, ...], bytes]:
+		"""Returns the indices into the _modules grid and the module values (0 or 1) that _draw_version()
+		draws for the given version number, which is in the range [7, 40]."""
+		# Calculate error correction code and pack bits
+		rem = ver  # version is uint6, in the range [7, 40]
+		for _ in range(12):
+			rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
+		bits = ver << 12 | rem  # uint18
+		assert bits >> 18 == 0
+		
+		# Two copies, across the diagonal from each other
+		size = ver * 4 + 17
+		indices: List[int] = []
+		values: List[int] = []
+		for i in range(18):
+			bit = (bits >> i) & 1
+			a = size - 11 + i % 3
+			b = i // 3
+			indices.extend((b * size + a, a * size + b))
+			values.extend((bit, bit))
+		return (tuple(indices), bytes(values))
 	
 	
 	@staticmethod
+	@functools.lru_cache(maxsize=None)
 	def _get_num_raw_data_modules(ver) -> int:
 		"""Returns the number of data bits that can be stored in a QR Code of the given version number, after
 		all function modules are excluded. This includes remainder bits, so it might not be a multiple of 8.
@@ -565,6 +693,7 @@ class QrCode:
 	
 	
 	@staticmethod
+	@functools.lru_cache(maxsize=None)
 	def _get_num_data_codewords(ver, ecl: QrCode.Ecc) -> int:
 		"""Returns the number of 8-bit data (i.e. not error correction) codewords contained in any
 		QR Code of the given version number and error correction level, with remainder bits discarded.
@@ -575,80 +704,76 @@ class QrCode:
 	
 	
 	@staticmethod
-	def _reed_solomon_compute_divisor(degree: int) -> List[int]:
+	@functools.lru_cache(maxsize=None)
+	def _get_gf_tables() -> Tuple[bytes, bytes]:
+		"""Returns the powers of the generator element 0x02 and their discrete logarithms in the field GF(2^8/0x11D),
+		for use in Reed-Solomon arithmetic. The power table is doubled in length so that the sum of two logarithms
+		can index it directly. Index 0 of the logarithm table is unused, because 0 has no logarithm."""
+		exp = bytearray(510)
+		log = bytearray(256)
+		z = 1
+		for i in range(255):
+			exp[i] = exp[i + 255] = z
+			log[z] = i
+			z = (z << 1) ^ ((z >> 7) * 0x11D)
+		return (bytes(exp), bytes(log))
+	
+	
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def _reed_solomon_compute_divisor(degree: int) -> bytes:
 		"""Returns a Reed-Solomon ECC generator polynomial for the given degree. This could be
 		implemented as a lookup table over all possible parameter values, instead of as an algorithm."""
 		if not (1 <= degree <= 255):
 			raise ValueError("Degree out of range")
 		# Polynomial coefficients are stored from highest to lowest power, excluding the leading term which is always 1.
 		# For example the polynomial x^3 + 255x^2 + 8x + 93 is stored as the uint8 array [255, 8, 93].
-		result = [0] * (degree - 1) + [1]  # Start off with the monomial x^0
+		result = bytearray(degree - 1) + b"\x01"  # Start off with the monomial x^0
 		
 		# Compute the product polynomial (x - r^0) * (x - r^1) * (x - r^2) * ... * (x - r^{degree-1}),
 		# and drop the highest monomial term which is always 1x^degree.
-		# Note that r = 0x02, which is a generator element of this field GF(2^8/0x11D).
-		root = 1
-		for _ in range(degree):  # Unused variable i
+		# Note that r = 0x02, which is a generator element of this field GF(2^8/0x11D),
+		# so the logarithm of r^i is simply i, and multiplying by r^i is a table lookup.
+		(exp, log) = QrCode._get_gf_tables()
+		for i in range(degree):
 			# Multiply the current product by (x - r^i)
 			for j in range(degree):
-				result[j] = QrCode._reed_solomon_multiply(result[j], root)
+				if result[j] != 0:
+					result[j] = exp[log[result[j]] + i]
 				if j + 1 < degree:
 					result[j] ^= result[j + 1]
-			root = QrCode._reed_solomon_multiply(root, 0x02)
-		return result
+		return bytes(result)
 	
 	
 	@staticmethod
-	def _reed_solomon_compute_remainder(data: List[int], divisor: List[int]) -> List[int]:
+	def _reed_solomon_compute_remainder(data: bytes, divisor: bytes) -> bytes:
 		"""Returns the Reed-Solomon error correction codeword for the given data and divisor polynomials."""
-		result = [0] * len(divisor)
+		# The remainder's coefficients are packed as the big-endian bytes of an integer, so that each step of the
+		# polynomial division is a shift and an XOR with a precomputed multiple of the divisor
+		degree = len(divisor)
+		multiples = QrCode._reed_solomon_get_multiples(divisor)
+		shift = (degree - 1) * 8
+		mask = (1 << (degree * 8)) - 1
+		result = 0
 		for b in data:  # Polynomial division
-			factor = b ^ result.pop(0)
-			result.append(0)
-			for (i, coef) in enumerate(divisor):
-				result[i] ^= QrCode._reed_solomon_multiply(coef, factor)
-		return result
+			result = ((result << 8) & mask) ^ multiples[b ^ (result >> shift)]
+		return result.to_bytes(degree, "big")
 	
 	
 	@staticmethod
-	def _reed_solomon_multiply(x: int, y: int) -> int:
-		"""Returns the product of the two given field elements modulo GF(2^8/0x11D). The arguments and result
-		are unsigned 8-bit integers. This could be implemented as a lookup table of 256*256 entries of uint8."""
-		if x >> 8 != 0 or y >> 8 != 0:
-			raise ValueError("Byte out of range")
-		# Russian peasant multiplication
-		z = 0
-		for i in reversed(range(8)):
-			z = (z << 1) ^ ((z >> 7) * 0x11D)
-			z ^= ((y >> i) & 1) * x
-		assert z >> 8 == 0
-		return z
-	
-	
-	def _finder_penalty_count_patterns(self, runhistory: collections.deque) -> int:
-		"""Can only be called immediately after a white run is added, and
-		returns either 0, 1, or 2. A helper function for _get_penalty_score()."""
-		n = runhistory[1]
-		assert n <= self._size * 3
-		core = n > 0 and (runhistory[2] == runhistory[4] == runhistory[5] == n) and runhistory[3] == n * 3
-		return (1 if (core and runhistory[0] >= n * 4 and runhistory[6] >= n) else 0) \
-		     + (1 if (core and runhistory[6] >= n * 4 and runhistory[0] >= n) else 0)
-	
-	
-	def _finder_penalty_terminate_and_count(self, currentruncolor: bool, currentrunlength: int, runhistory: collections.deque) -> int:
-		"""Must be called at the end of a line (row or column) of modules. A helper function for _get_penalty_score()."""
-		if currentruncolor:  # Terminate black run
-			self._finder_penalty_add_history(currentrunlength, runhistory)
-			currentrunlength = 0
-		currentrunlength += self._size  # Add white border to final run
-		self._finder_penalty_add_history(currentrunlength, runhistory)
-		return self._finder_penalty_count_patterns(runhistory)
-	
-	
-	def _finder_penalty_add_history(self, currentrunlength: int, runhistory: collections.deque) -> None:
-		if runhistory[0] == 0:
-			currentrunlength += self._size  # Add white border to initial run
-		runhistory.appendleft(currentrunlength)
+	@functools.lru_cache(maxsize=None)
+	def _reed_solomon_get_multiples(divisor: bytes) -> Tuple[int, ...]:
+		"""Returns a tuple of 256 integers, where entry f holds the given divisor polynomial times the field
+		element f, with the coefficients packed as big-endian bytes (i.e. the same order as the divisor)."""
+		(exp, log) = QrCode._get_gf_tables()
+		# Multiplying by a nonzero factor is adding logarithms, so keep the divisor in log form
+		divlogs = [(log[coef] if coef != 0 else None) for coef in divisor]
+		result = [0]
+		for factor in range(1, 256):
+			logfactor = log[factor]
+			product = bytes((exp[logcoef + logfactor] if logcoef is not None else 0) for logcoef in divlogs)
+			result.append(int.from_bytes(product, "big"))
+		return tuple(result)
 	
 	
 	# ---- Constants and tables ----
@@ -662,21 +787,28 @@ class QrCode:
 	_PENALTY_N3 = 40
 	_PENALTY_N4 = 10
 	
+	# For use in _get_penalty_score(), on modules stored as bytes of 0s and 1s.
+	_RUN_REGEX = re.compile(b"\x00+|\x01+")
+	_BITS_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+	
+	# For use in _draw_codewords(), on the binary digits of the codewords.
+	_DIGITS_TO_BITS = bytes.maketrans(b"01", b"\x00\x01")
+	
 	_ECC_CODEWORDS_PER_BLOCK = (
 		# Version: (note that index 0 is for padding, and is set to an illegal value)
-		# 0,  1,  2,  3,  4,  5,  6,  7,  8,  9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40    Error correction level
-		(-1,  7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28, 28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),  # Low
-		(-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26, 26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),  # Medium
-		(-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30, 28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),  # Quartile
-		(-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28, 30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30))  # High
+		#        0,  1,  2,  3,  4,  5,  6,  7,  8,  9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40    Error correction level
+		bytes((255,  7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28, 28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30)),  # Low
+		bytes((255, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26, 26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28)),  # Medium
+		bytes((255, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30, 28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30)),  # Quartile
+		bytes((255, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28, 30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30)))  # High
 	
 	_NUM_ERROR_CORRECTION_BLOCKS = (
 		# Version: (note that index 0 is for padding, and is set to an illegal value)
-		# 0, 1, 2, 3, 4, 5, 6, 7, 8, 9,10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40    Error correction level
-		(-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4,  4,  4,  4,  4,  6,  6,  6,  6,  7,  8,  8,  9,  9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),  # Low
-		(-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5,  5,  8,  9,  9, 10, 10, 11, 13, 14, 16, 17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),  # Medium
-		(-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8,  8, 10, 12, 16, 12, 17, 16, 18, 21, 20, 23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),  # Quartile
-		(-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25, 25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81))  # High
+		#        0, 1, 2, 3, 4, 5, 6, 7, 8, 9,10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40    Error correction level
+		bytes((255, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4,  4,  4,  4,  4,  6,  6,  6,  6,  7,  8,  8,  9,  9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25)),  # Low
+		bytes((255, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5,  5,  8,  9,  9, 10, 10, 11, 13, 14, 16, 17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49)),  # Medium
+		bytes((255, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8,  8, 10, 12, 16, 12, 17, 16, 18, 21, 20, 23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68)),  # Quartile
+		bytes((255, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25, 25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81)))  # High
 	
 	_MASK_PATTERNS = (
 		(lambda x, y:  (x + y) % 2                  ),
@@ -739,22 +871,26 @@ class QrSegment:
 		if isinstance(data, str):
 			raise TypeError("Byte string/list expected")
 		bb = _BitBuffer()
-		for b in data:
-			bb.append_bits(b, 8)
+		bb.append_bytes(bytes(data))
 		return QrSegment(QrSegment.Mode.BYTE, len(data), bb)
 	
 	
 	@staticmethod
 	def make_numeric(digits: str) -> QrSegment:
 		"""Returns a segment representing the given string of decimal digits encoded in numeric mode."""
-		if QrSegment.NUMERIC_REGEX.fullmatch(digits) is None:
+		if not isinstance(digits, str):
+			raise TypeError("Text string expected")
+		if digits != "" and not (digits.isascii() and digits.isdigit()):  # Same as NUMERIC_REGEX
 			raise ValueError("String contains non-numeric characters")
 		bb = _BitBuffer()
-		i = 0
-		while i < len(digits):  # Consume up to 3 digits per iteration
-			n = min(len(digits) - i, 3)
-			bb.append_bits(int(digits[i : i + n]), n * 3 + 1)
-			i += n
+		full = len(digits) - len(digits) % 3
+		# Look up the 10 bits spelled out for each group of 3 digits, then pack the whole string at once
+		groups = [digits[i : i + 3] for i in range(0, full, 3)]
+		bits = "".join(map(QrSegment._NUMERIC_GROUP_BITS.__getitem__, groups))
+		if full < len(digits):  # 1 or 2 digits remaining
+			n = len(digits) - full
+			bits += "{:0{}b}".format(int(digits[full : ]), n * 3 + 1)
+		bb.append_bit_string(bits)
 		return QrSegment(QrSegment.Mode.NUMERIC, len(digits), bb)
 	
 	
@@ -763,15 +899,18 @@ class QrSegment:
 		"""Returns a segment representing the given text string encoded in alphanumeric mode.
 		The characters allowed are: 0 to 9, A to Z (uppercase only), space,
 		dollar, percent, asterisk, plus, hyphen, period, slash, colon."""
-		if QrSegment.ALPHANUMERIC_REGEX.fullmatch(text) is None:
-			raise ValueError("String contains unencodable characters in alphanumeric mode")
+		if not isinstance(text, str):
+			raise TypeError("Text string expected")
+		# Look up the bits spelled out for each group of 2 characters (11 bits) and the final
+		# lone character if any (6 bits), then pack the whole string at once. A character
+		# that can't be encoded makes its group missing from the table.
+		groups = [text[i : i + 2] for i in range(0, len(text), 2)]
+		try:
+			bits = "".join(map(QrSegment._ALPHANUMERIC_GROUP_BITS.__getitem__, groups))
+		except KeyError:
+			raise ValueError("String contains unencodable characters in alphanumeric mode") from None
 		bb = _BitBuffer()
-		for i in range(0, len(text) - 1, 2):  # Process groups of 2
-			temp = QrSegment._ALPHANUMERIC_ENCODING_TABLE[text[i]] * 45
-			temp += QrSegment._ALPHANUMERIC_ENCODING_TABLE[text[i + 1]]
-			bb.append_bits(temp, 11)
-		if len(text) % 2 > 0:  # 1 character remaining
-			bb.append_bits(QrSegment._ALPHANUMERIC_ENCODING_TABLE[text[-1]], 6)
+		bb.append_bit_string(bits)
 		return QrSegment(QrSegment.Mode.ALPHANUMERIC, len(text), bb)
 	
 	
@@ -785,9 +924,9 @@ class QrSegment:
 		# Select the most efficient segment encoding automatically
 		if text == "":
 			return []
-		elif QrSegment.NUMERIC_REGEX.fullmatch(text) is not None:
+		elif text.isascii() and text.isdigit():  # Same as NUMERIC_REGEX, but without building a match object
 			return [QrSegment.make_numeric(text)]
-		elif QrSegment.ALPHANUMERIC_REGEX.fullmatch(text) is not None:
+		elif QrSegment._ALPHANUMERIC_CHARS.issuperset(text):  # Same as ALPHANUMERIC_REGEX
 			return [QrSegment.make_alphanumeric(text)]
 		else:
 			return [QrSegment.make_bytes(text.encode("UTF-8"))]
@@ -803,11 +942,9 @@ class QrSegment:
 		elif assignval < (1 << 7):
 			bb.append_bits(assignval, 8)
 		elif assignval < (1 << 14):
-			bb.append_bits(2, 2)
-			bb.append_bits(assignval, 14)
+			bb.append_bits((2 << 14) | assignval, 16)  # Prefix 10, then 14 bits of value
 		elif assignval < 1000000:
-			bb.append_bits(6, 3)
-			bb.append_bits(assignval, 21)
+			bb.append_bits((6 << 21) | assignval, 24)  # Prefix 110, then 21 bits of value
 		else:
 			raise ValueError("ECI assignment value out of range")
 		return QrSegment(QrSegment.Mode.ECI, 0, bb)
@@ -825,12 +962,12 @@ class QrSegment:
 	_numchars: int
 	
 	# The data bits of this segment. Accessed through get_data().
-	_bitdata: List[int]
+	_bitdata: _BitBuffer
 	
 	
 	# ---- Constructor (low level) ----
 	
-	def __init__(self, mode: QrSegment.Mode, numch: int, bitdata: List[int]) -> None:
+	def __init__(self, mode: QrSegment.Mode, numch: int, bitdata: Union[List[int], _BitBuffer]) -> None:
 		"""Creates a new QR Code segment with the given attributes and data.
 		The character count (numch) must agree with the mode and the bit buffer length,
 		but the constraint isn't checked. The given bit buffer is cloned and stored."""
@@ -840,7 +977,11 @@ class QrSegment:
 			raise ValueError()
 		self._mode = mode
 		self._numchars = numch
-		self._bitdata = list(bitdata)  # Make defensive copy
+		if isinstance(bitdata, _BitBuffer):
+			self._bitdata = _BitBuffer()
+			self._bitdata.append_buffer(bitdata)  # Make defensive copy
+		else:
+			self._bitdata = _BitBuffer.from_bits(bitdata)
 	
 	
 	# ---- Accessor methods ----
@@ -855,7 +996,7 @@ class QrSegment:
 	
 	def get_data(self) -> List[int]:
 		"""Returns a new copy of the data bits of this segment."""
-		return list(self._bitdata)  # Make defensive copy
+		return self._bitdata.get_bits()  # Make defensive copy
 	
 	
 	# Package-private function
@@ -887,8 +1028,22 @@ class QrSegment:
 
 	ALPHANUMERIC_REGEX = re.compile(r"[A-Z0-9 $%*+./:-]*")
 	
-	# (Private) Dictionary of "0"->0, "A"->10, "$"->37, etc.
-	_ALPHANUMERIC_ENCODING_TABLE = {ch: i for (i, ch) in enumerate("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:")}
+	# (Private) The characters that are encodable in alphanumeric mode, in the order of their values 0 to 44.
+	_ALPHANUMERIC_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+	
+	# (Private) The set of all characters that are encodable in alphanumeric mode.
+	_ALPHANUMERIC_CHARS = frozenset(_ALPHANUMERIC_CHARSET)
+	
+	# (Private) Maps every string of 3 decimal digits, "000" to "999", to its value spelled out in 10 binary digits.
+	_NUMERIC_GROUP_BITS = {"{:03d}".format(i): "{:010b}".format(i) for i in range(1000)}
+	
+	# (Private) Maps every alphanumeric mode character to its value spelled out in 6 binary digits,
+	# and every string of 2 such characters to its value (45 * first + second) spelled out in 11 binary digits.
+	_ALPHANUMERIC_GROUP_BITS = {
+		**{a: "{:06b}".format(i) for (i, a) in enumerate(_ALPHANUMERIC_CHARSET)},
+		**{(a + b): "{:011b}".format(i * 45 + j)
+			for ((i, a), (j, b)) in itertools.product(enumerate(_ALPHANUMERIC_CHARSET), repeat=2)},
+	}
 	
 	
 	# ---- Public helper enumeration ----
@@ -896,6 +1051,8 @@ class QrSegment:
 	class Mode:
 		"""Describes how a segment's data bits are interpreted. Immutable."""
 		
+		__slots__ = ("_modebits", "_charcounts")  # No per-instance dict, as only these fields are ever set
+		
 		_modebits: int  # The mode indicator bits, which is a uint4 value (range 0 to 15)
 		_charcounts: Tuple[int,int,int]  # Number of character count bits for three different version ranges
 		
@@ -913,7 +1070,14 @@ class QrSegment:
 		def num_char_count_bits(self, ver: int) -> int:
 			"""Returns the bit width of the character count field for a segment in this mode
 			in a QR Code at the given version number. The result is in the range [0, 16]."""
-			return self._charcounts[(ver + 7) // 17]
+			return self._charcounts[QrSegment.Mode.char_count_range(ver)]
+		
+		# Package-private method
+		@staticmethod
+		def char_count_range(ver: int) -> int:
+			"""Returns the index (0, 1 or 2) of the version range that the given version number
+			falls in, where all versions in one range share the same character count field widths."""
+			return (ver + 7) // 17
 		
 		# Placeholders
 		NUMERIC     : QrSegment.Mode
@@ -933,20 +1097,83 @@ class QrSegment:
 
 # ---- Private helper class ----
 
-class _BitBuffer(list):
-	"""An appendable sequence of bits (0s and 1s). Mainly used by QrSegment."""
+class _BitBuffer:
+	"""An appendable sequence of bits (0s and 1s), held in one integer. Mainly used by QrSegment."""
+	
+	# All the bits of this buffer as an unsigned integer, whose lowest bit
+	# is the last bit appended. Always 0 <= _value < 2^_length.
+	_value: int
+	
+	# The number of bits in this buffer. Always zero or positive.
+	_length: int
+	
+	
+	def __init__(self) -> None:
+		"""Creates an empty bit buffer."""
+		self._value = 0
+		self._length = 0
+	
+	
+	@staticmethod
+	def from_bits(bits) -> _BitBuffer:
+		"""Returns a new bit buffer holding the given sequence of bits, each of which must be 0 or 1."""
+		digits = bytes(bits)
+		if len(digits.translate(None, b"\x00\x01")) > 0:
+			raise ValueError("Bit value out of range")
+		result = _BitBuffer()
+		if len(digits) > 0:
+			result.append_bits(int(digits.translate(_BitBuffer._BITS_TO_DIGITS), 2), len(digits))
+		return result
+	
+	
+	def __len__(self) -> int:
+		"""Returns the number of bits in this buffer."""
+		return self._length
+	
 	
 	def append_bits(self, val: int, n: int) -> None:
 		"""Appends the given number of low-order bits of the given
 		value to this buffer. Requires n >= 0 and 0 <= val < 2^n."""
 		if n < 0 or val >> n != 0:
 			raise ValueError("Value out of range")
-		self.extend(((val >> i) & 1) for i in reversed(range(n)))
-
-
-def _get_bit(x: int, i: int) -> bool:
-	"""Returns true iff the i'th bit of x is set to 1."""
-	return (x >> i) & 1 != 0
+		self._value = (self._value << n) | val
+		self._length += n
+	
+	
+	def append_bytes(self, data: bytes) -> None:
+		"""Appends all 8 bits of each given byte to this buffer, in big endian."""
+		self.append_bits(int.from_bytes(data, "big"), len(data) * 8)
+	
+	
+	def append_bit_string(self, bits: str) -> None:
+		"""Appends the bits spelled out by the given string of "0" and "1" characters."""
+		if len(bits) > 0:
+			self.append_bits(int(bits, 2), len(bits))
+	
+	
+	def append_buffer(self, other: _BitBuffer) -> None:
+		"""Appends all the bits of the given buffer to this buffer."""
+		self.append_bits(other._value, other._length)
+	
+	
+	def get_bytes(self) -> bytes:
+		"""Returns the bits of this buffer packed into bytes in big endian,
+		with the final partial byte (if any) padded with 0s at the end."""
+		pad = -self._length % 8
+		return (self._value << pad).to_bytes((self._length + pad) // 8, "big")
+	
+	
+	def get_bits(self) -> List[int]:
+		"""Returns a new list of the bits in this buffer, each of which is 0 or 1."""
+		if self._length == 0:
+			return []
+		digits = "{:0{}b}".format(self._value, self._length).encode("ASCII")
+		return list(digits.translate(_BitBuffer._DIGITS_TO_BITS))
+	
+	
+	# For use in from_bits() and get_bits(), converting between bits stored as bytes of 0s and 1s and binary digits.
+	_BITS_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+	_DIGITS_TO_BITS = bytes.maketrans(b"01", b"\x00\x01")
 
 
 